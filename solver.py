@@ -1,5 +1,34 @@
+import heapq
+import io
 import sys
-from typing import List, Tuple, Optional
+from typing import List, Tuple, Optional, TextIO
+
+def to_lit(dimacs_lit: int) -> int:
+    """
+    将DIMACS文字转换为内部编码. 
+    
+    内部文字编码为 2*var | sign, 肯定文字sign为0, 否定文字sign为1, 
+    因此 lit >> 1 为变量编号, lit ^ 1 为其否定文字, 文字可直接作为数组下标. 
+    
+    Args:
+        dimacs_lit: DIMACS格式的文字, 正数表示肯定文字, 负数表示否定文字
+        
+    Returns:
+        内部编码的文字
+    """
+    return (abs(dimacs_lit) << 1) | (dimacs_lit < 0)
+
+def to_dimacs(lit: int) -> int:
+    """
+    将内部编码的文字转换回DIMACS文字, 用于输出. 
+    
+    Args:
+        lit: 内部编码的文字
+        
+    Returns:
+        DIMACS格式的文字
+    """
+    return -(lit >> 1) if lit & 1 else lit >> 1
 
 class SATSolver:
     def __init__(self, debug_output: int = 0) -> None:
@@ -10,250 +39,524 @@ class SATSolver:
             debug_output: 调试输出级别, 0表示不输出调试信息
         """
         self.debug = debug_output
-        self.clauses = []         # 存储所有子句(包括学习的新子句)
-        self.var_info = {}        # 变量信息：值、决策层级、原因子句
+        self.clauses = []         # 存储所有长度不为2的子句(包括学习的新子句), 二元子句直接内联在监视表中
+        self.value_of_lit: List[Optional[bool]] = []      # 按文字索引的真值, 未赋值为None
+        self.levels: List[int] = []                       # 按变量编号索引的决策层级
+        self.reasons: List[Optional[int]] = []            # 按变量编号索引的原因, 见assign
         self.decision_level = 0    # 当前决策层级
-        self.trail = []            # 赋值栈, 按顺序记录赋值操作
+        self.trail = []            # 赋值栈, 按顺序记录被赋值为真的文字
         self.trail_lim = []        # 记录每个决策层级的起始位置
-        self.var_order = []        # 变量选择顺序
+        self.var_order = []        # 所有变量编号
+        self.activity: List[float] = []  # 按变量编号索引的VSIDS活跃度
+        self.var_inc = 1.0         # 当前活跃度增量
+        self.var_decay = 0.95      # 活跃度衰减系数
+        self.order_heap = []       # 决策变量候选堆, 元素为(-活跃度, 变量编号), 允许过期项
+        self.saved_phase = bytearray()  # 按变量编号索引的上一次取值(相位), 1为真, 0为假
+        self.seen = bytearray()    # 冲突分析中按变量编号索引的访问标记, 分析结束后全部清零
+        self.luby_u = 1            # Luby序列的迭代状态(u, v), v为当前Luby值
+        self.luby_v = 1
+        self.restart_conflicts = 0  # 自上次重启以来的冲突数
+        self.restart_limit = 100   # 重启间隔的基本单位(冲突数)
+        self.learned_start = 0     # self.clauses中学习子句的起始编号, 之前均为原始子句
+        self.clause_lbd: List[int] = []         # 按子句编号索引的LBD(学习时涉及的不同决策层级数), 原始子句为0
+        self.clause_activity: List[float] = []  # 按子句编号索引的子句活跃度
+        self.cla_inc = 1.0         # 当前子句活跃度增量
+        self.cla_decay = 0.999     # 子句活跃度衰减系数
+        self.reduce_interval = 2000  # 每隔多少次冲突化简一次学习子句库
+        self.reduce_conflicts = 0  # 自上次化简以来的冲突数
+        self.var_to_clauses: List[List[int]] = []  # 按变量编号索引, 包含该变量的子句编号(二元子句见监视表)
+        self.watches: List[list] = []  # 按文字索引的监视表, 监视项为('bin', 另一文字) 或 ('big', 子句编号, 阻塞文字)
+        self.qhead = 0             # 赋值栈中下一个待传播文字的位置, trail[qhead:]即传播队列
 
-    def parse_dimacs(self) -> bool:
+    def parse_dimacs(self, input_file: Optional[TextIO] = None) -> bool:
         """
         初始化，解析DIMACS格式输入
         
+        Args:
+            input_file: 输入的文件对象, 默认为标准输入
+        
         Returns:
             如果输入有效返回True，如果发现空子句返回False
         """
-        for line in sys.stdin:
+        if input_file is None:
+            input_file = sys.stdin
+        for line in input_file:
             line = line.strip()
             if line.startswith('c') or not line:
                 continue
             if line.startswith('p cnf'):
                 _, _, n_vars, _ = line.split()
-                self.var_order = list(range(1, int(n_vars)+1))
+                n_vars = int(n_vars)
+                self.var_order = list(range(1, n_vars+1))
+                self.value_of_lit = [None] * (2*n_vars+2)
+                self.levels = [0] * (n_vars+1)
+                self.reasons = [None] * (n_vars+1)
+                self.watches = [[] for _ in range(2*n_vars+2)]
+                self.var_to_clauses = [[] for _ in range(n_vars+1)]
+                self.activity = [0.0] * (n_vars+1)
+                self.saved_phase = bytearray(b'\x01' * (n_vars+1))
+                self.seen = bytearray(n_vars+1)
                 continue
             clause = [int(x) for x in line.split()[:-1]]
             if not clause:  # 检测到空子句
                 self.debug_print("Empty clause detected")
                 return False
+            if self.debug:
+                self.debug_print(f"Parsed clause: {clause}")
+            clause = list(dict.fromkeys(to_lit(x) for x in clause))  # 去除重复文字, 两个监视文字必须不同
+            if any(lit ^ 1 in clause for lit in clause):  # 恒真子句, 无需加入
+                continue
+            if len(clause) == 2:
+                self.add_binary(clause[0], clause[1])
+                continue
+            clause_idx = len(self.clauses)
             self.clauses.append(clause)
-            self.debug_print(f"Parsed clause: {clause}")
+            self.clause_lbd.append(0)
+            self.clause_activity.append(0.0)
+            self.index_clause(clause_idx)
+            if len(clause) > 1:
+                self.add_watch(clause_idx, clause[0], clause[1])
+        self.learned_start = len(self.clauses)
+        self.init_activity()
         return True
 
+    def index_clause(self, clause_idx: int) -> None:
+        """
+        将子句加入变量到子句的倒排索引var_to_clauses. 
+        
+        Args:
+            clause_idx: 子句编号
+        """
+        for lit in self.clauses[clause_idx]:
+            self.var_to_clauses[lit >> 1].append(clause_idx)
+
+    def init_activity(self) -> None:
+        """
+        按变量在子句中的出现次数初始化VSIDS活跃度. 
+        
+        出现次数由var_to_clauses和监视表中的二元子句统计, 
+        出现次数多的变量在还没有冲突信息时优先被选为决策变量. 
+        """
+        for var in self.var_order:
+            count = len(self.var_to_clauses[var])
+            for lit in (var << 1, var << 1 | 1):
+                for watch in self.watches[lit]:
+                    if watch[0] == 'bin':
+                        count += 1
+            self.activity[var] = float(count)
+        self.rebuild_order_heap()
+
+    def add_watch(self, clause_idx: int, lit1: int, lit2: int) -> None:
+        """
+        为子句添加两个监视文字. 
+
+        监视文字始终保存在子句的前两个位置, 即clause[0]和clause[1]. 
+        每个监视项同时记录另一个监视文字作为阻塞文字(blocker). 
+        
+        Args:
+            clause_idx: 子句编号
+            lit1: 第一个监视文字
+            lit2: 第二个监视文字
+        """
+        self.watches[lit1].append(('big', clause_idx, lit2))
+        self.watches[lit2].append(('big', clause_idx, lit1))
+
+    def add_binary(self, lit1: int, lit2: int) -> None:
+        """
+        添加二元子句. 
+        
+        二元子句不存入self.clauses, 而是直接内联在两个文字的监视表中, 
+        传播时只需检查另一个文字的真值. 
+        
+        Args:
+            lit1: 第一个文字
+            lit2: 第二个文字
+        """
+        self.watches[lit1].append(('bin', lit2))
+        self.watches[lit2].append(('bin', lit1))
+
     def debug_print(self, message: str) -> None:
         """
         打印调试信息. 
         
+        热点路径上的调用处需先判断self.debug, 避免在不输出时也构造格式化字符串. 
+        
         Args:
             message: 要打印的调试信息
         """
         if self.debug:
             print(message)
 
-    def assign(self, var: int, value: bool, reason_list: Optional[List[int]] = None) -> None:
+    def assign(self, lit: int, reason: Optional[int] = None) -> None:
         """
-        给变量赋值. 
+        将文字赋值为真. 
         
         Args:
-            var: 要赋值的变量编号
-            value: 赋给变量的布尔值
-            reason_clause: 导致此赋值的原因变量构成的列表, 若为决策变量则为None
+            lit: 要赋值为真的文字(内部编码)
+            reason: 导致此赋值的原因. 非负数为原因子句在self.clauses中的编号, 该子句的clause[0]即为lit; 
+                负数表示二元子句, ~reason为其中另一个(为假的)文字; 若为决策变量则为None
         """
-        self.var_info[var] = {
-            'value': value,
-            'decision_level': self.decision_level,
-            'reason': reason_list
-        }
-        self.trail.append(var)
-        self.debug_print(f"Assign: {var} = {value} (DL: {self.decision_level}, Reason: {reason_list})")
+        var = lit >> 1
+        self.value_of_lit[lit] = True
+        self.value_of_lit[lit ^ 1] = False
+        self.levels[var] = self.decision_level
+        self.reasons[var] = reason
+        self.trail.append(lit)
+        if self.debug:
+            self.debug_print(f"Assign: {var} = {not lit & 1} (DL: {self.decision_level}, Reason: {reason})")
 
-    def unassign(self, var: int) -> None: 
+    def bump_activity(self, var: int) -> None:
         """
-        在self.info中取消变量的赋值. 
+        增加变量的VSIDS活跃度. 
+        
+        只会对已赋值的变量调用, 新的活跃度在回溯取消赋值时进入候选堆. 
         
         Args:
-            var: 要取消赋值的变量编号
+            var: 变量编号
         """
-        if var in self.var_info:
-            del self.var_info[var]
+        self.activity[var] += self.var_inc
 
-    def unit_propagation(self) -> bool:
+    def decay_activity(self) -> None:
         """
-        执行一步单元传播过程. 
+        衰减所有变量和学习子句的活跃度. 
         
-        查找单元子句并为其中的变量赋值, 一次只传播一个变量. 
+        通过放大增量var_inc和cla_inc等价地实现衰减, 数值过大时整体缩放(变量活跃度缩放后重建候选堆). 
+        """
+        self.var_inc /= self.var_decay
+        if self.var_inc > 1e100:
+            self.var_inc *= 1e-100
+            self.activity = [a * 1e-100 for a in self.activity]
+            self.rebuild_order_heap()
+        self.cla_inc /= self.cla_decay
+        if self.cla_inc > 1e20:
+            self.cla_inc *= 1e-20
+            self.clause_activity = [a * 1e-20 for a in self.clause_activity]
+
+    def rebuild_order_heap(self) -> None:
+        """
+        用所有未赋值变量的当前活跃度重建候选堆, 清除过期项. 
+        """
+        self.order_heap = [(-self.activity[var], var) for var in self.var_order
+                           if self.value_of_lit[var << 1] is None]
+        heapq.heapify(self.order_heap)
+
+    def propagate(self) -> Optional[List[int]]:
+        """
+        基于两个监视文字的单元传播. 
+        
+        依次取出赋值栈中尚未传播的文字p(即trail[qhead:]), 只检查监视其否定文字p^1的子句: 
+        二元子句的监视项直接给出另一个文字; 
+        若监视项的阻塞文字已为真, 子句已满足, 无需访问子句本身; 
+        否则为子句寻找新的非假文字替换p^1作为监视文字, 找不到时子句为单元子句或冲突子句. 
         
         Returns:
-            如果成功传播一个变量返回True, 否则返回False
+            发生冲突的子句, 如果没有冲突则返回None
         """
-        for clause in self.clauses:
-            unassigned = []
-            is_satisfied = False
-            for lit in clause:
-                var = abs(lit)
-                if var not in self.var_info:
-                    unassigned.append(lit)
-                else:
-                    if (lit > 0 and self.var_info[var]['value']) or (lit < 0 and not self.var_info[var]['value']):
-                        is_satisfied = True
+        # 热点循环: 将属性查找提前到局部变量
+        value_of_lit = self.value_of_lit
+        watches = self.watches
+        clauses = self.clauses
+        trail = self.trail
+        qhead = self.qhead
+        assign = self.assign
+        debug = self.debug
+        while qhead < len(trail):
+            false_lit = trail[qhead] ^ 1
+            qhead += 1
+            watch_iter = iter(watches[false_lit])
+            kept = []  # 仍然监视false_lit的监视项
+            watches[false_lit] = kept
+            for watch in watch_iter:
+                if watch[0] == 'bin':
+                    kept.append(watch)
+                    other = watch[1]
+                    v = value_of_lit[other]
+                    if v is True:
+                        continue
+                    if v is None:
+                        assign(other, ~false_lit)
+                        if debug:
+                            self.debug_print(f"Unit propagation: {to_dimacs(other)} from clause {[to_dimacs(other), to_dimacs(false_lit)]}")
+                        continue
+                    kept.extend(watch_iter)
+                    self.qhead = len(trail)
+                    if debug:
+                        self.debug_print(f"Conflict detected in clause: {[to_dimacs(other), to_dimacs(false_lit)]}")
+                    return [other, false_lit]
+
+                _, clause_idx, blocker = watch
+                if value_of_lit[blocker] is True:
+                    kept.append(watch)
+                    continue
+
+                clause = clauses[clause_idx]
+                # 保证被赋假的监视文字位于clause[1]
+                other = clause[0]
+                if other == false_lit:
+                    other = clause[1]
+                    clause[0] = other
+                    clause[1] = false_lit
+                v = value_of_lit[other]
+                if v is True:
+                    kept.append(('big', clause_idx, other))
+                    continue
+
+                # 寻找新的监视文字
+                for k in range(2, len(clause)):
+                    lit = clause[k]
+                    if value_of_lit[lit] is not False:
+                        clause[1] = lit
+                        clause[k] = false_lit
+                        watches[lit].append(('big', clause_idx, other))
                         break
-            if is_satisfied:
-                continue
-            if len(unassigned) == 1:
-                lit = unassigned[0]
-                var = abs(lit)
-                value = (lit > 0)
-                # 原因列表: 逼迫这个变量赋值的其他变量, 为UP子句中的其他变量. 特别地, 单变量作为子句是, 原因列表是空列表. 
-                reason_list = [abs(l) for l in clause if abs(l) != var]
-                self.assign(var, value, reason_list)
-                self.debug_print(f"Unit propagation: {var} = {value} from clause {clause}, reason: {reason_list}")
-                return True
-        return False
+                else:
+                    kept.append(watch)
+                    if v is None:
+                        # 原因: 逼迫这个文字为真的子句, 其余文字均为假, 且clause[0]即为other
+                        assign(other, clause_idx)
+                        if debug:
+                            self.debug_print(f"Unit propagation: {to_dimacs(other)} from clause {[to_dimacs(l) for l in clause]}")
+                    else:
+                        kept.extend(watch_iter)
+                        self.qhead = len(trail)
+                        if debug:
+                            self.debug_print(f"Conflict detected in clause: {[to_dimacs(l) for l in clause]}")
+                        return clause
+        self.qhead = qhead
+        return None
 
     def check_conflict(self) -> Optional[List[int]]:
         """
-        检查是否存在冲突的子句. 
+        检查是否存在不被当前赋值满足的子句. 
         
-        遍历所有子句, 检查是否有完全不满足的子句(冲突). 
+        遍历所有子句(包括内联在监视表中的二元子句), 每个文字的真值直接查value_of_lit. 
+        不参与求解过程, 在调试模式下用于校验求得的解. 
         
         Returns:
-            发生冲突的子句, 如果没有冲突则返回None
+            不满足的子句, 如果所有子句都满足则返回None
         """
+        value_of_lit = self.value_of_lit
         for clause in self.clauses:
-            clause_unsat = True
-            for lit in clause:
-                var = abs(lit)
-                if var not in self.var_info:
-                    clause_unsat = False
-                    break
-                if (lit > 0 and self.var_info[var]['value']) or (lit < 0 and not self.var_info[var]['value']):
-                    clause_unsat = False
-                    break
-            if clause_unsat:
-                self.debug_print(f"Conflict detected in clause: {clause}")
+            if not any(value_of_lit[lit] for lit in clause):
                 return clause
+        for lit, watch_list in enumerate(self.watches):
+            if value_of_lit[lit]:
+                continue
+            for watch in watch_list:
+                if watch[0] == 'bin' and not value_of_lit[watch[1]]:
+                    return [lit, watch[1]]
         return None
 
-    def learn_clause(self, conflict_clause: List[int]) -> List[int]:
+    def analyze_conflict(self, conflict_clause: List[int]) -> Tuple[List[int], int]:
         """
-        从冲突中学习新子句. 
+        分析冲突, 产生1-UIP学习子句并确定回溯层级. 
         
-        从冲突子句开始, 通过替换非决策变量来生成学习子句. 
+        从冲突子句开始沿赋值栈倒序做归结: 只展开当前决策层级的变量, 
+        直到当前层级只剩一个变量(第一唯一蕴含点, UIP)为止. 
+        学习子句由UIP的否定文字和较低层级的文字组成, 回溯层级是其中除UIP外的最高决策层级. 
+        learned_clause[0]为UIP对应的文字, learned_clause[1]为回溯层级上的文字, 二者即为监视文字. 
+        参与归结的学习子句的活跃度同时增加. 
         
         Args:
             conflict_clause: 发生冲突的子句
             
         Returns:
-            学习到的新子句, 如果无法解决冲突则返回None
+            元组(学习子句, 回溯层级)
         """
+        levels = self.levels
+        seen = self.seen
+        clauses = self.clauses
+        reasons = self.reasons
+        learned_clause = [None]  # 占位, 最后填入UIP对应的文字
+        back_level = 0
+        path_count = 0           # 当前层级中已标记但尚未展开的变量数
+        idx = len(self.trail) - 1
+        # 冲突子句和原因子句(除clause[0]外)中的文字均为假, 可以直接放入学习子句
+        reason_lits = conflict_clause
+        if self.debug:
+            self.debug_print(f"vars in clause: {[lit >> 1 for lit in reason_lits]}")
 
-        conflict_vars = [abs(lit) for lit in conflict_clause]
-        self.debug_print(f"vars in clause: {conflict_vars}")
-
-        # 循环替换非决策变量
         while True:
-            need_to_replace = False
-
-            for var in list(conflict_vars):
-                if var in self.var_info and not (self.var_info[var]['reason'] is None):
-                    need_to_replace = True
-                    conflict_vars.remove(var)
-
-                    reason_vars = [abs(lit) for lit in self.var_info[var]['reason']]
+            for lit in reason_lits:
+                var = lit >> 1
+                if not seen[var] and levels[var] > 0:
+                    seen[var] = 1
+                    self.bump_activity(var)
+                    if levels[var] == self.decision_level:
+                        path_count += 1
+                    else:
+                        learned_clause.append(lit)
+                        if levels[var] > back_level:
+                            back_level = levels[var]
+                            # 保持最高层级的文字在learned_clause[1]
+                            learned_clause[1], learned_clause[-1] = learned_clause[-1], learned_clause[1]
 
-                    for reason_var in reason_vars:
-                        if reason_var not in conflict_vars:
-                            conflict_vars.append(reason_var)
-            
-            if not need_to_replace:
+            # 沿赋值栈找到下一个需要展开的变量
+            while not seen[self.trail[idx] >> 1]:
+                idx -= 1
+            lit = self.trail[idx]
+            idx -= 1
+            seen[lit >> 1] = 0
+            path_count -= 1
+            if path_count == 0:
                 break
-        
-        # 从循环处理后的原因列表中学习新子句
-        learned_clause = []
-        for var in conflict_vars:
-            if self.var_info[var]['value']:
-                learned_clause.append(-var)
+            reason = reasons[lit >> 1]
+            if reason < 0:
+                reason_lits = (~reason,)
             else:
-                learned_clause.append(var)
+                if reason >= self.learned_start:
+                    self.clause_activity[reason] += self.cla_inc
+                reason_lits = clauses[reason][1:]
 
-        learned_clause.sort(key=abs)
-        self.debug_print(f"Learned clause: {learned_clause}")
+        # UIP在赋值栈中为真, 其否定文字进入学习子句
+        learned_clause[0] = lit ^ 1
+        # 当前层级的标记已在遍历赋值栈时清除, 这里清除较低层级的标记
+        for lit in learned_clause[1:]:
+            seen[lit >> 1] = 0
+        if self.debug:
+            self.debug_print(f"Learned clause: {[to_dimacs(l) for l in learned_clause]}")
+            self.debug_print(f"Back to Decision Level : {back_level}")
 
-        return learned_clause
+        return learned_clause, back_level
 
-    def determine_backtrack_level(self, learned_clause: List[int]) -> int:
+    def backtrack(self, level: int) -> None:
         """
-        根据学习子句计算需要回溯的决策层级. 
-
-        是学习子句中第二高的决策层级.
+        回溯到指定的决策层级. 
+        
+        一次性撤销赋值栈中所有高于指定层级的变量赋值, 
+        并保存其取值作为下次决策的相位, 同时将这些变量放回候选堆. 
         
         Args:
-            learned_clause: 学习到的子句
-            
-        Returns:
-            需要回溯到的决策层级
+            level: 要回溯到的决策层级
         """
-        decision_levels = []
-        for lit in learned_clause:
-            var = abs(lit)
-            if var in self.var_info:
-                decision_levels.append(self.var_info[var]['decision_level'])
-        
-        decision_levels = sorted(decision_levels)
-        
-        if len(decision_levels) <= 1:
-            return 0
-        
-        back_level = decision_levels[-2]
+        if self.decision_level > level:
+            pos = self.trail_lim[level]
+            del self.trail_lim[level:]
+            value_of_lit = self.value_of_lit
+            reasons = self.reasons
+            saved_phase = self.saved_phase
+            activity = self.activity
+            order_heap = self.order_heap
+            for lit in self.trail[pos:]:
+                var = lit >> 1
+                # 赋值栈中的文字为真, 肯定文字(符号位为0)对应取值为真
+                saved_phase[var] = lit & 1 ^ 1
+                value_of_lit[lit] = None
+                value_of_lit[lit ^ 1] = None
+                reasons[var] = None
+                heapq.heappush(order_heap, (-activity[var], var))
+            del self.trail[pos:]
+            self.decision_level = level
+            self.qhead = pos
+        if len(self.order_heap) > 4 * len(self.var_order):
+            self.rebuild_order_heap()
+
+    def restart(self) -> None:
+        """
+        重启搜索. 
         
-        self.debug_print(f"Back to Decision Level : {back_level}")
-        return back_level
+        回溯到第0层, 保留学习子句、变量活跃度和保存的相位, 
+        并按Luby序列推进下一次重启的间隔. 
+        """
+        if self.debug:
+            self.debug_print(f"Restart after {self.restart_conflicts} conflicts")
+        self.backtrack(0)
+        self.restart_conflicts = 0
+        if (self.luby_u & -self.luby_u) == self.luby_v:
+            self.luby_u += 1
+            self.luby_v = 1
+        else:
+            self.luby_v <<= 1
 
-    def analyze_conflict(self, conflict_clause: List[int]) -> Tuple[List[int], int]:
+    def add_learned_clause(self, learned_clause: List[int]) -> None:
         """
-        分析冲突, 产生学习子句并确定回溯层级. 
+        加入学习子句, 并为UIP对应的文字赋值. 
         
-        根据冲突子句学习新的子句, 找到根本原因并确定回溯层级. 
+        回溯之后学习子句中只有clause[0]未赋值, 子句成为单元子句; 
+        clause[0]与clause[1]作为监视文字. 同时记录子句的LBD, 用于学习子句库化简. 
         
         Args:
-            conflict_clause: 发生冲突的子句
-            
-        Returns:
-            元组(学习子句, 回溯层级)
+            learned_clause: 回溯后的学习子句
         """
-        learned_clause = self.learn_clause(conflict_clause)
-            
-        back_level = self.determine_backtrack_level(learned_clause)
-        
-        return learned_clause, back_level
+        clause = learned_clause
+        if len(clause) == 2:
+            self.add_binary(clause[0], clause[1])
+            self.assign(clause[0], ~clause[1])
+            return
 
-    def backtrack(self, level: int) -> None:
+        clause_idx = len(self.clauses)
+        self.clauses.append(clause)
+        # UIP所在层级加上其余文字涉及的不同层级
+        self.clause_lbd.append(len({self.levels[lit >> 1] for lit in clause[1:]}) + 1)
+        self.clause_activity.append(self.cla_inc)
+        self.index_clause(clause_idx)
+        if len(clause) > 2:
+            self.add_watch(clause_idx, clause[0], clause[1])
+        self.assign(clause[0], clause_idx)
+
+    def reduce_db(self) -> None:
         """
-        回溯到指定的决策层级. 
+        化简学习子句库. 
         
-        撤销所有高于指定层级的变量赋值. 
-        
-        Args:
-            level: 要回溯到的决策层级
+        将长度大于2的学习子句按(LBD, -活跃度)排序, 删除较差的一半. 
+        LBD不超过2的子句、单文字子句和当前作为原因的子句(锁定子句)总是保留, 
+        二元子句内联在监视表中, 从不删除. 
+        删除后压缩self.clauses, 并同步更新监视表、倒排索引和原因中的子句编号. 
         """
-        while self.decision_level > level:
-            self.decision_level -= 1
-            pos = self.trail_lim.pop()
-            for var in self.trail[pos:]:
-                self.unassign(var)
-            self.trail = self.trail[:pos]
+        clauses = self.clauses
+        value_of_lit = self.value_of_lit
+        candidates = []
+        for clause_idx in range(self.learned_start, len(clauses)):
+            clause = clauses[clause_idx]
+            if len(clause) <= 2 or self.clause_lbd[clause_idx] <= 2:
+                continue
+            # 锁定子句: 是clause[0]当前赋值的原因
+            if value_of_lit[clause[0]] is True and self.reasons[clause[0] >> 1] == clause_idx:
+                continue
+            candidates.append(clause_idx)
+        candidates.sort(key=lambda i: (self.clause_lbd[i], -self.clause_activity[i]))
+        removed = set(candidates[len(candidates) // 2:])
+        if not removed:
+            return
+
+        # 压缩子句库, new_index[旧编号] = 新编号, 被删除的子句为-1
+        new_index = [-1] * len(clauses)
+        new_clauses, new_lbd, new_activity = [], [], []
+        for clause_idx, clause in enumerate(clauses):
+            if clause_idx in removed:
+                continue
+            new_index[clause_idx] = len(new_clauses)
+            new_clauses.append(clause)
+            new_lbd.append(self.clause_lbd[clause_idx])
+            new_activity.append(self.clause_activity[clause_idx])
+        self.clauses = new_clauses
+        self.clause_lbd = new_lbd
+        self.clause_activity = new_activity
+
+        self.watches = [[watch if watch[0] == 'bin' else ('big', new_index[watch[1]], watch[2])
+                         for watch in watch_list if watch[0] == 'bin' or new_index[watch[1]] >= 0]
+                        for watch_list in self.watches]
+        self.var_to_clauses = [[new_index[i] for i in clause_list if new_index[i] >= 0]
+                               for clause_list in self.var_to_clauses]
+        for lit in self.trail:
+            reason = self.reasons[lit >> 1]
+            if reason is not None and reason >= 0:
+                self.reasons[lit >> 1] = new_index[reason]
+        if self.debug:
+            self.debug_print(f"Reduce clause database: removed {len(removed)} learned clauses")
 
     def pick_variable(self) -> Optional[int]:
         """
         选择下一个决策变量. 
         
-        从未赋值的变量中选择一个作为下一个决策变量. 
+        VSIDS: 从候选堆中取出活跃度最高的未赋值变量, 跳过已赋值或活跃度已过期的项. 
         
         Returns:
             选择的变量编号, 如果所有变量都已赋值则返回None
         """
-        for var in self.var_order:
-            if var not in self.var_info:
+        while self.order_heap:
+            neg_activity, var = heapq.heappop(self.order_heap)
+            if self.value_of_lit[var << 1] is None and -neg_activity == self.activity[var]:
                 return var
         return None
 
@@ -261,36 +564,48 @@ class SATSolver:
         """
         执行冲突驱动的子句学习(CDCL)算法. 
         
-        实现CDCL主循环, 包括冲突检查、单元传播、冲突分析、回溯和决策变量选择. 
+        实现CDCL主循环, 包括单元传播(同时检查冲突)、冲突分析、回溯、按Luby序列重启、学习子句库化简和决策变量选择. 
         
         Returns:
             "SAT"表示可满足, "UNSAT"表示不可满足
         """
         self.decision_level = 0
         self.trail_lim = []
+
+        # 单文字子句不参与监视, 直接在第0层赋值
+        for clause_idx, clause in enumerate(self.clauses):
+            if len(clause) == 1:
+                lit = clause[0]
+                value = self.value_of_lit[lit]
+                if value is False:
+                    return "UNSAT"
+                if value is None:
+                    self.assign(lit, clause_idx)
         
         while True:
-            conflict_clause = self.check_conflict()
+            conflict_clause = self.propagate()
             if conflict_clause is not None:
                 if self.decision_level == 0:
                     return "UNSAT"
                 
-                analysis_result = self.analyze_conflict(conflict_clause)
-                learned_clause, back_level = analysis_result
-                if not learned_clause:
-                    return "UNSAT"
-                
-                self.debug_print(f"Learned clause: {learned_clause}")
-                self.debug_print(f"Backtrack to level: {back_level}")
-                self.clauses.append(learned_clause)
+                learned_clause, back_level = self.analyze_conflict(conflict_clause)
+                self.decay_activity()
+                if self.debug:
+                    self.debug_print(f"Learned clause: {[to_dimacs(l) for l in learned_clause]}")
+                    self.debug_print(f"Backtrack to level: {back_level}")
                 self.backtrack(back_level)
+                self.add_learned_clause(learned_clause)
+
+                self.restart_conflicts += 1
+                if self.restart_conflicts >= self.restart_limit * self.luby_v:
+                    self.restart()
+                self.reduce_conflicts += 1
+                if self.reduce_conflicts >= self.reduce_interval:
+                    self.reduce_conflicts = 0
+                    self.reduce_db()
                 continue
             
-            propagated = self.unit_propagation()
-            if propagated:
-                continue
-            
-            if len(self.var_info) == len(self.var_order):
+            if len(self.trail) == len(self.var_order):
                 return "SAT"
                 
             var = self.pick_variable()
@@ -299,25 +614,45 @@ class SATSolver:
                 
             self.decision_level += 1
             self.trail_lim.append(len(self.trail))
-            self.assign(var, True, None)
+            # 相位保存: 按变量上一次的取值做决策
+            self.assign(var << 1 | (self.saved_phase[var] ^ 1), None)
 
-    def solve(self) -> None:
+    def solve_string(self, dimacs: str) -> str:
         """
-        解决SAT问题并输出结果. 
+        解决以字符串给出的SAT问题. 
         
-        解析输入, 执行CDCL算法, 并以标准格式输出结果. 
+        解析DIMACS格式字符串, 执行CDCL算法, 返回标准格式的结果文本. 
+        供测试脚本在同一进程中直接调用, 每个求解器对象只求解一次. 
+        
+        Args:
+            dimacs: DIMACS格式的输入字符串
+            
+        Returns:
+            与命令行输出相同的结果文本
         """
-        if not self.parse_dimacs():
-            print("s ERROR")
-            return
+        if not self.parse_dimacs(io.StringIO(dimacs)):
+            return "s ERROR\n"
             
         result = self.cdcl()
-        print("s SATISFIABLE" if result == "SAT" else "s UNSATISFIABLE")
+        lines = ["s SATISFIABLE" if result == "SAT" else "s UNSATISFIABLE"]
         if result == "SAT":
-            print("v", end="")
-            for var in self.var_order:
-                print(f" {var if self.var_info[var]['value'] else -var}", end="")
-            print(" 0")
+            values = "".join(f" {var if self.value_of_lit[var << 1] else -var}" for var in self.var_order)
+            lines.append(f"v{values} 0")
+            if self.debug:
+                conflict_clause = self.check_conflict()
+                if conflict_clause is None:
+                    self.debug_print("Model check passed")
+                else:
+                    self.debug_print(f"Model check failed on clause: {[to_dimacs(l) for l in conflict_clause]}")
+        return "\n".join(lines) + "\n"
+
+    def solve(self) -> None:
+        """
+        解决SAT问题并输出结果. 
+        
+        从标准输入读取问题, 并以标准格式输出结果. 
+        """
+        print(self.solve_string(sys.stdin.read()), end="")
 
 if __name__ == "__main__":
     debug = 1 if "--debug" in sys.argv else 0
@@ -2,8 +2,12 @@ import random
 import subprocess
 import os
 import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
+from solver import SATSolver
+
 def generate_random_cnf(num_vars, num_clauses):
     """
     生成随机CNF公式的DIMACS格式字符串，大幅优化以提高SAT概率
@@ -20,6 +24,9 @@ def generate_random_cnf(num_vars, num_clauses):
     4. 模拟部分变量赋值，确保至少有一条满足路径
     5. 控制子句密度，避免过度约束
     
+    所有子句长度一次性抽取，每个子句的生成只涉及其自身的几个变量，
+    不再在每个子句中遍历全部变量，生成时间随子句数线性增长。
+    
     Args:
         num_vars: 变量数量
         num_clauses: 子句数量
@@ -36,8 +43,13 @@ def generate_random_cnf(num_vars, num_clauses):
     
     lines = [f"p cnf {num_vars} {effective_clauses}"]
     
-    # 记录每个变量正负出现的次数
-    var_occurrence = {i: {'pos': 0, 'neg': 0} for i in range(1, num_vars + 1)}
+    # 记录每个变量正负出现的次数及总次数，按变量编号索引
+    pos_count = [0] * (num_vars + 1)
+    neg_count = [0] * (num_vars + 1)
+    total_count = [0] * (num_vars + 1)
+    
+    # 按出现频率排序的变量列表，每次只需在上一次的顺序上重新排序
+    vars_by_freq = list(range(1, num_vars + 1))
     
     # 记录单子句约束
     unit_clauses = {}  # 存储变量的指定值，如 {1: True} 表示变量1为True
@@ -51,29 +63,26 @@ def generate_random_cnf(num_vars, num_clauses):
             var = random.randint(1, num_vars)
             if var not in assigned_vars:
                 assigned_vars[var] = random.choice([True, False])
+    assigned_items = list(assigned_vars.items())
     
-    for _ in range(effective_clauses):
-        # 修改子句长度概率
-        rand = random.random()
-        if rand < 0.005:  # 降低单子句概率
-            clause_length = 1
-        elif rand < 0.255:  # 0.005 + 0.25
-            clause_length = 2
-        else:
-            clause_length = 3
-        
+    def choose_positive(var, bias):
+        # 基于出现频率平衡正负：出现多的一侧以bias的概率被避开
+        if pos_count[var] > neg_count[var]:
+            return random.random() > bias
+        elif neg_count[var] > pos_count[var]:
+            return random.random() < bias
+        return random.random() > 0.5
+    
+    # 一次性抽取所有子句的长度
+    clause_lengths = random.choices((1, 2, 3), weights=(0.005, 0.25, 0.745), k=effective_clauses)
+    
+    for clause_length in clause_lengths:
         # 确保子句长度不超过可用变量数
         clause_length = min(clause_length, num_vars)
         
         if clause_length == 1:
             # 对单子句特殊处理，避免直接矛盾
-            available_vars = []
-            for var in range(1, num_vars + 1):
-                # 如果变量没有在单子句中出现过，则可用
-                if var not in unit_clauses:
-                    available_vars.append(var)
-            
-            if not available_vars:
+            if len(unit_clauses) >= num_vars:
                 # 如果没有可用变量，尝试改为长度2的子句
                 clause_length = 2
                 if num_vars < 2:
@@ -85,89 +94,57 @@ def generate_random_cnf(num_vars, num_clauses):
                     else:
                         is_positive = random.random() > 0.5
                     
-                    literal = var if is_positive else -var
-                    clause = [literal]
                     unit_clauses[var] = is_positive
-                    
-                    # 更新变量出现次数
                     if is_positive:
-                        var_occurrence[var]['pos'] += 1
+                        pos_count[var] += 1
                     else:
-                        var_occurrence[var]['neg'] += 1
+                        neg_count[var] += 1
+                    total_count[var] += 1
                     
-                    clause_str = " ".join(map(str, clause)) + " 0"
-                    lines.append(clause_str)
+                    lines.append(f"{var if is_positive else -var} 0")
                     continue
             else:
-                # 随机选择一个可用变量
-                var = random.choice(available_vars)
+                # 随机选择一个没有在单子句中出现过的变量
+                var = random.randint(1, num_vars)
+                while var in unit_clauses:
+                    var = random.randint(1, num_vars)
                 
                 # 根据预分配值或出现次数决定正负
                 if var in assigned_vars:
                     is_positive = assigned_vars[var]
                 else:
-                    pos_count = var_occurrence[var]['pos']
-                    neg_count = var_occurrence[var]['neg']
-                    
-                    if pos_count > neg_count:
-                        # 如果正出现更多，倾向于生成负变量
-                        is_positive = random.random() > 0.7
-                    elif neg_count > pos_count:
-                        # 如果负出现更多，倾向于生成正变量
-                        is_positive = random.random() < 0.7
-                    else:
-                        # 平均情况，随机决定
-                        is_positive = random.random() > 0.5
+                    is_positive = choose_positive(var, 0.7)
                 
-                literal = var if is_positive else -var
-                clause = [literal]
                 unit_clauses[var] = is_positive
-                
-                # 更新变量出现次数
                 if is_positive:
-                    var_occurrence[var]['pos'] += 1
+                    pos_count[var] += 1
                 else:
-                    var_occurrence[var]['neg'] += 1
+                    neg_count[var] += 1
+                total_count[var] += 1
                 
-                clause_str = " ".join(map(str, clause)) + " 0"
-                lines.append(clause_str)
+                lines.append(f"{var if is_positive else -var} 0")
                 continue
         
         # 处理长度为2或3的子句
         # 尝试包含至少一个预分配为True的变量，确保子句可满足
         ensure_sat = (random.random() < 0.7)  # 70%概率确保子句可满足
         
-        if ensure_sat and assigned_vars:
+        if ensure_sat and assigned_items:
             # 选择一个预分配变量加入子句
-            sat_var, sat_value = random.choice(list(assigned_vars.items()))
+            sat_var, sat_value = random.choice(assigned_items)
             
             # 使子句包含这个满足变量
             sat_literal = sat_var if sat_value else -sat_var
             
-            # 剩余变量随机选择
-            remaining_vars = list(set(range(1, num_vars + 1)) - {sat_var})
-            if len(remaining_vars) >= clause_length - 1:
-                remaining_selected = random.sample(remaining_vars, clause_length - 1)
-                clause_vars = [sat_var] + remaining_selected
-                
-                # 创建子句
-                clause = [sat_literal]  # 确保这个变量使子句满足
+            if num_vars - 1 >= clause_length - 1:
+                # 剩余变量从除sat_var外的变量中随机选择：在1..num_vars-1中抽样，跳过sat_var
+                remaining_selected = [v if v < sat_var else v + 1
+                                      for v in random.sample(range(1, num_vars), clause_length - 1)]
                 
-                # 为剩余变量决定正负性
+                # 创建子句，确保第一个变量使子句满足
+                clause = [sat_literal]
                 for var in remaining_selected:
-                    pos_count = var_occurrence[var]['pos']
-                    neg_count = var_occurrence[var]['neg']
-                    
-                    # 基于出现频率平衡正负
-                    if pos_count > neg_count:
-                        is_positive = random.random() > 0.6
-                    elif neg_count > pos_count:
-                        is_positive = random.random() < 0.6
-                    else:
-                        is_positive = random.random() > 0.5
-                    
-                    literal = var if is_positive else -var
-                    clause.append(literal)
+                    clause.append(var if choose_positive(var, 0.6) else -var)
             else:
                 # 变量不够，随机选择全部变量
                 clause_vars = random.sample(range(1, num_vars + 1), clause_length)
@@ -179,28 +156,13 @@ def generate_random_cnf(num_vars, num_clauses):
                         # 使用预分配值
                         is_positive = sat_value
                     else:
-                        pos_count = var_occurrence[var]['pos']
-                        neg_count = var_occurrence[var]['neg']
-                        
-                        # 基于出现频率平衡正负
-                        if pos_count > neg_count:
-                            is_positive = random.random() > 0.6
-                        elif neg_count > pos_count:
-                            is_positive = random.random() < 0.6
-                        else:
-                            is_positive = random.random() > 0.5
-                    
-                    literal = var if is_positive else -var
-                    clause.append(literal)
+                        is_positive = choose_positive(var, 0.6)
+                    clause.append(var if is_positive else -var)
         else:
-            # 常规情况，尝试基于变量出现频率选择变量
-            var_freq = [(var, var_occurrence[var]['pos'] + var_occurrence[var]['neg']) 
-                      for var in range(1, num_vars + 1)]
-            var_freq.sort(key=lambda x: x[1])  # 按出现频率排序
-            
-            # 引入随机性并优先选择出现频率低的变量
+            # 常规情况，引入随机性并优先选择出现频率低的变量
             if num_vars >= clause_length * 2:
-                candidate_vars = [v[0] for v in var_freq[:max(num_vars//2, clause_length*2)]]
+                vars_by_freq.sort(key=total_count.__getitem__)  # 按出现频率排序
+                candidate_vars = vars_by_freq[:max(num_vars//2, clause_length*2)]
                 clause_vars = random.sample(candidate_vars, clause_length)
             else:
                 clause_vars = random.sample(range(1, num_vars + 1), clause_length)
@@ -208,34 +170,12 @@ def generate_random_cnf(num_vars, num_clauses):
             # 决定每个变量的正负性
             clause = []
             for var in clause_vars:
-                # 检查是否为预分配变量
-                if var in assigned_vars:
-                    # 50%概率使用预分配值，50%概率随机
-                    if random.random() < 0.5:
-                        is_positive = assigned_vars[var]
-                    else:
-                        pos_count = var_occurrence[var]['pos']
-                        neg_count = var_occurrence[var]['neg']
-                        
-                        if pos_count > neg_count:
-                            is_positive = random.random() > 0.6
-                        elif neg_count > pos_count:
-                            is_positive = random.random() < 0.6
-                        else:
-                            is_positive = random.random() > 0.5
+                # 预分配变量有50%概率使用预分配值
+                if var in assigned_vars and random.random() < 0.5:
+                    is_positive = assigned_vars[var]
                 else:
-                    pos_count = var_occurrence[var]['pos']
-                    neg_count = var_occurrence[var]['neg']
-                    
-                    if pos_count > neg_count:
-                        is_positive = random.random() > 0.6
-                    elif neg_count > pos_count:
-                        is_positive = random.random() < 0.6
-                    else:
-                        is_positive = random.random() > 0.5
-                
-                literal = var if is_positive else -var
-                clause.append(literal)
+                    is_positive = choose_positive(var, 0.6)
+                clause.append(var if is_positive else -var)
         
         # 确保不是全正或全负的子句
         all_pos = all(lit > 0 for lit in clause)
@@ -248,14 +188,13 @@ def generate_random_cnf(num_vars, num_clauses):
         
         # 更新变量出现次数统计
         for lit in clause:
-            var = abs(lit)
             if lit > 0:
-                var_occurrence[var]['pos'] += 1
+                pos_count[lit] += 1
             else:
-                var_occurrence[var]['neg'] += 1
+                neg_count[-lit] += 1
+            total_count[abs(lit)] += 1
         
-        clause_str = " ".join(map(str, clause)) + " 0"
-        lines.append(clause_str)
+        lines.append(" ".join(map(str, clause)) + " 0")
     
     return "\n".join(lines)
 
@@ -263,9 +202,12 @@ def run_solver(dimacs_input, solver_path, is_exe=False):
     """
     运行SAT求解器并返回结果
     
+    可执行文件通过子进程运行；Python求解器直接在当前进程中调用，
+    避免每个测试都启动一个新的解释器。
+    
     Args:
         dimacs_input: DIMACS格式的输入字符串
-        solver_path: 求解器路径
+        solver_path: 求解器路径(仅用于可执行文件)
         is_exe: 是否为可执行文件
     
     Returns:
@@ -282,15 +224,13 @@ def run_solver(dimacs_input, solver_path, is_exe=False):
         )
         output, error = process.communicate(input=dimacs_input)
     else:
-        # 对于Python脚本，使用python命令运行
-        process = subprocess.Popen(
-            ["python", solver_path], 
-            stdin=subprocess.PIPE, 
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        output, error = process.communicate(input=dimacs_input)
+        # 对于Python求解器，在当前进程中求解
+        try:
+            output = SATSolver().solve_string(dimacs_input)
+            error = ""
+        except Exception:
+            output = ""
+            error = traceback.format_exc()
     
     # 查找结果行
     for line in output.splitlines():
@@ -328,6 +268,43 @@ def save_wrong_case(dimacs_input, output1, output2, case_number):
     with open(wrong_dir / f"case_{case_number}_output_bf.txt", "w") as f:
         f.write(output2)
 
+def run_one(seed, num_vars, num_clauses, bf_solver_path):
+    """
+    运行一次测试：生成随机CNF公式并用两个求解器求解
+    
+    在工作进程中执行，使用给定的随机种子，便于复现。
+    
+    Args:
+        seed: 本次测试的随机种子
+        num_vars: 变量数量
+        num_clauses: 子句数量
+        bf_solver_path: 暴力求解器路径
+    
+    Returns:
+        (actual_clauses, result1, output1, result2, output2, dimacs_input, solve_time)
+    """
+    random.seed(seed)
+    start_time = time.time()
+    
+    # 生成随机CNF公式
+    dimacs_input = generate_random_cnf(num_vars, num_clauses)
+    
+    # 从生成的DIMACS中获取实际子句数
+    actual_clauses = 0
+    for line in dimacs_input.splitlines():
+        if line.startswith("p cnf"):
+            parts = line.split()
+            if len(parts) >= 4:
+                actual_clauses = int(parts[3])
+            break
+    
+    # 运行两个求解器
+    result1, output1 = run_solver(dimacs_input, None, is_exe=False)
+    result2, output2 = run_solver(dimacs_input, bf_solver_path, is_exe=True)
+    
+    solve_time = time.time() - start_time
+    return actual_clauses, result1, output1, result2, output2, dimacs_input, solve_time
+
 def main():
     # 使用Path设置求解器路径
     current_dir = Path(__file__).parent
@@ -352,12 +329,7 @@ def main():
     # 新策略：子句数量与循环次数相同，变量数每4个循环增加一次
     num_vars = initial_vars
     loop_count = 0
-    
-    print("开始测试...")
-    print("循环次数 | 变量数 | 原始子句数 | 实际子句数 | solver结果 | bf_solver结果 | 一致性 | 求解时间")
-    print("-" * 90)
-    
-    # 循环测试，按新规则增加变量和子句数量
+    test_params = []
     while loop_count <= max_clauses or num_vars <= max_vars:
         loop_count += 1
         num_clauses = loop_count
@@ -365,39 +337,38 @@ def main():
         # 每4次循环，变量数增加1
         if loop_count % 4 == 0:
             num_vars += 1
-        
-        start_time = time.time()
-        
-        # 生成随机CNF公式
-        dimacs_input = generate_random_cnf(num_vars, num_clauses)
-        
-        # 从生成的DIMACS中获取实际子句数
-        actual_clauses = 0
-        for line in dimacs_input.splitlines():
-            if line.startswith("p cnf"):
-                parts = line.split()
-                if len(parts) >= 4:
-                    actual_clauses = int(parts[3])
-                break
-        
-        # 运行两个求解器
-        result1, output1 = run_solver(dimacs_input, str(solver_path), is_exe=False)
-        result2, output2 = run_solver(dimacs_input, str(bf_solver_path), is_exe=True)
-        
-        end_time = time.time()
-        solve_time = end_time - start_time
-        
-        # 检查结果是否一致
-        total_tests += 1
-        if result1 == result2:
-            passed_tests += 1
-            result_str = "通过"
-        else:
-            wrong_cases += 1
-            result_str = "不一致"
-            save_wrong_case(dimacs_input, output1, output2, wrong_cases)
-        
-        print(f"{loop_count:8d} | {num_vars:6d} | {num_clauses:10d} | {actual_clauses:10d} | {result1:10s} | {result2:13s} | {result_str:4s} | {solve_time:.2f}s")
+        test_params.append((loop_count, num_vars, num_clauses))
+    
+    # 每个测试使用 base_seed + 循环次数 作为随机种子
+    base_seed = random.randrange(2**32)
+    
+    print("开始测试...")
+    print(f"随机种子: {base_seed}")
+    print("循环次数 | 变量数 | 原始子句数 | 实际子句数 | solver结果 | bf_solver结果 | 一致性 | 求解时间")
+    print("-" * 90)
+    
+    # 各次测试相互独立，分配到多个进程并行执行，按完成顺序输出
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        futures = {
+            executor.submit(run_one, base_seed + loop_count, num_vars, num_clauses, str(bf_solver_path)):
+                (loop_count, num_vars, num_clauses)
+            for loop_count, num_vars, num_clauses in test_params
+        }
+        for future in as_completed(futures):
+            loop_count, num_vars, num_clauses = futures[future]
+            actual_clauses, result1, output1, result2, output2, dimacs_input, solve_time = future.result()
+            
+            # 检查结果是否一致
+            total_tests += 1
+            if result1 == result2:
+                passed_tests += 1
+                result_str = "通过"
+            else:
+                wrong_cases += 1
+                result_str = "不一致"
+                save_wrong_case(dimacs_input, output1, output2, wrong_cases)
+            
+            print(f"{loop_count:8d} | {num_vars:6d} | {num_clauses:10d} | {actual_clauses:10d} | {result1:10s} | {result2:13s} | {result_str:4s} | {solve_time:.2f}s")
         
     # 输出统计结果
     pass_rate = (passed_tests / total_tests) * 100 if total_tests > 0 else 0